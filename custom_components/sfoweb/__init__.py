@@ -45,8 +45,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     # Unload platforms
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        # Remove entry from hass data
-        hass.data[DOMAIN].pop(entry.entry_id)
+        # Remove entry from hass data and close the scraper's HTTP session
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await entry_data["scraper"].async_close()
         
         # If no more entries, remove domain data
         if not hass.data[DOMAIN]:
@@ -35,25 +35,33 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         errors = {}
         
         if user_input is not None:
-            try:
-                # Test credentials
-                scraper = SFOEnhancedScraper(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
-                credentials_valid = await scraper.async_test_credentials()
+            # Already configured accounts are rejected without logging in
+            await self.async_set_unique_id(user_input[CONF_USERNAME])
+            self._abort_if_unique_id_configured()
+            
+            # Too short to be valid SFOWeb credentials, so don't try to log in
+            if len(user_input[CONF_USERNAME]) < 3 or len(user_input[CONF_PASSWORD]) < 3:
+                errors["base"] = "invalid_auth"
+            else:
+                try:
+                    # Test credentials
+                    scraper = SFOEnhancedScraper(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
+                    try:
+                        credentials_valid = await scraper.async_test_credentials()
+                    finally:
+                        await scraper.async_close()
                 
-                if credentials_valid:
-                    await self.async_set_unique_id(user_input[CONF_USERNAME])
-                    self._abort_if_unique_id_configured()
+                    if credentials_valid:
+                        return self.async_create_entry(
+                            title=f"SFOWeb ({user_input[CONF_USERNAME]})",
+                            data=user_input,
+                        )
+                    else:
+                        errors["base"] = "invalid_auth"
                     
-                    return self.async_create_entry(
-                        title=f"SFOWeb ({user_input[CONF_USERNAME]})",
-                        data=user_input,
-                    )
-                else:
-                    errors["base"] = "invalid_auth"
-                    
-            except Exception as e:
-                _LOGGER.error(f"Error testing credentials: {e}")
-                errors["base"] = "connection"
+                except Exception as e:
+                    _LOGGER.error(f"Error testing credentials: {e}")
+                    errors["base"] = "connection"
 
         return self.async_show_form(
             step_id="user",
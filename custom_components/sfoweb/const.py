@@ -11,3 +11,6 @@ CONF_INSTITUTION = "institution"
 
 # Default values
 DEFAULT_SCAN_INTERVAL = 15  # minutes
+
+# Keep idle connections just past one poll so the next refresh can reuse them
+CONNECTION_KEEPALIVE = DEFAULT_SCAN_INTERVAL * 60 + 60  # seconds
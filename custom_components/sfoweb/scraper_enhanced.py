@@ -2,21 +2,163 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
+import hashlib
 import logging
 import re
 import json
-from typing import Any, Dict, List, Optional
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse, parse_qs
 import aiohttp
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
 
 from .const import (
     APPOINTMENTS_URL,
+    CONNECTION_KEEPALIVE,
     LOGIN_URL,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# When credentials last passed a test, keyed by a hash of the credentials.
+# Failures aren't kept, since a network error looks the same as a bad password.
+CREDENTIAL_CACHE_TTL = 60  # seconds
+CREDENTIAL_CACHE_SIZE = 8
+_CREDENTIAL_CACHE: Dict[str, float] = {}
+
+# Appointment table lookups, compiled once
+CELLS_XPATH = etree.XPath('.//td | .//th')
+
+# Retries for requests that time out or hit a server error
+REQUEST_RETRIES = 1
+RETRY_BACKOFF = 1.0  # seconds, doubled on each retry
+
+# Script and markup patterns that point at login API endpoints
+API_ENDPOINT_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        # Direct API URLs
+        r'["\']([^"\']*(?:api|ajax|service)[^"\']*(?:login|auth|signin)[^"\']*)["\']',
+        r'["\']([^"\']*(?:login|auth|signin)[^"\']*(?:api|ajax|service)[^"\']*)["\']',
+        
+        # Fetch/AJAX calls
+        r'fetch\(["\']([^"\']+)["\']',
+        r'XMLHttpRequest.*?open.*?["\'](?:POST|GET)["\'].*?["\']([^"\']+)["\']',
+        r'axios\.(?:post|get)\(["\']([^"\']+)["\']',
+        r'\$\.(?:post|get|ajax)\(["\']([^"\']+)["\']',
+        
+        # Form actions that might be AJAX
+        r'action=["\']([^"\']*(?:login|auth|signin)[^"\']*)["\']',
+        
+        # Common endpoint patterns
+        r'["\']([^"\']*\/(?:api|service)\/[^"\']*)["\']',
+        r'endpoint["\s]*[:=]["\s]*["\']([^"\']+)["\']',
+        r'loginUrl["\s]*[:=]["\s]*["\']([^"\']+)["\']',
+    )
+]
+
+# Script patterns that point at appointment API endpoints
+APPOINTMENT_API_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r'["\']([^"\']*(?:api|ajax)[^"\']*(?:appointment|aftale|calendar)[^"\']*)["\']',
+        r'["\']([^"\']*(?:appointment|aftale|calendar)[^"\']*(?:api|ajax)[^"\']*)["\']',
+        r'fetch\(["\']([^"\']+/(?:api|ajax)/[^"\']*(?:appointment|aftale)[^"\']*)["\']',
+    )
+]
+
+PASSWORD_INPUT_RE = re.compile(r'type=["\']?password', re.IGNORECASE)
+
+# Login response checks, searched case-insensitively on the raw body so it is never
+# decoded. IGNORECASE only folds ASCII in bytes patterns, so æ and Æ are spelled out
+# in both UTF-8 and Latin-1.
+AUTH_SUCCESS_RE = re.compile(
+    rb'dashboard|aftaler|appointments|kalender|schedule|velkommen|welcome|logout|logud'
+    rb'|profil|profile|guardian|for(?:\xc3\xa6|\xc3\x86|\xe6|\xc6)ldre|parent',
+    re.IGNORECASE,
+)
+AUTH_ERROR_RE = re.compile(
+    rb'invalid|ugyldig|forkert|wrong|error|fejl|login failed|unauthorized|forbidden', re.IGNORECASE
+)
+LOGIN_TEXT_RE = re.compile(rb'login|password|brugernavn|sign in', re.IGNORECASE)
+DATE_RE = re.compile(r'\d{1,2}[./]\d{1,2}')
+
+# A <meta> charset declaration near the top of a page
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_SCAN = 1024  # bytes
+
+# Larger bodies are cut off; the appointments table is near the top of the page
+MAX_BODY_SIZE = 2 * 1024 * 1024  # bytes
+BODY_CHUNK_SIZE = 64 * 1024  # bytes
+
+# Paths a logged-out request gets redirected to
+LOGIN_PATH_RE = re.compile(r'login|logon|signin|auth', re.IGNORECASE)
+
+# Login form lookups, compiled once
+PARENT_LINKS_XPATH = etree.XPath(
+    '//a[re:test(@href, "parent|foraeldr|guardian|voksen", "i")'
+    ' or (@href and re:test(string(.), "forældre|parent|guardian|voksen", "i"))]/@href',
+    namespaces={'re': 'http://exslt.org/regular-expressions'},
+)
+FORMS_XPATH = etree.XPath('//form')
+USERNAME_INPUTS_XPATH = etree.XPath(
+    './/input[re:test(@name, "user|email|login", "i")]',
+    namespaces={'re': 'http://exslt.org/regular-expressions'},
+)
+PASSWORD_INPUTS_XPATH = etree.XPath('.//input[@type="password"]')
+HIDDEN_INPUTS_XPATH = etree.XPath('.//input[@type="hidden" and @name]')
+SUBMIT_INPUTS_XPATH = etree.XPath('.//input[@type="submit"]')
+
+# Fallback appointment containers, tried in order: li, div.appointment, div.event
+FALLBACK_XPATHS = [
+    etree.XPath('//li'),
+    etree.XPath('//div[contains(concat(" ", normalize-space(@class), " "), " appointment ")]'),
+    etree.XPath('//div[contains(concat(" ", normalize-space(@class), " "), " event ")]'),
+]
+
+
+async def read_body(response: aiohttp.ClientResponse) -> bytes:
+    """Read a response body, stopping after MAX_BODY_SIZE bytes."""
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(BODY_CHUNK_SIZE):
+        body += chunk
+        if len(body) >= MAX_BODY_SIZE:
+            _LOGGER.debug("Response from %s exceeds %s bytes, truncating", response.url, MAX_BODY_SIZE)
+            del body[MAX_BODY_SIZE:]
+            break
+    
+    return bytes(body)
+
+
+def page_encoding(content: bytes, charset: Optional[str]) -> str:
+    """Pick a page's encoding: the header charset, then a <meta> charset, then UTF-8."""
+    match = META_CHARSET_RE.search(content[:META_CHARSET_SCAN])
+    meta_charset = match.group(1).decode('ascii') if match else None
+    
+    # Unknown names are skipped so decoding and lxml never see them
+    for candidate in (charset, meta_charset):
+        if candidate:
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                _LOGGER.debug("Ignoring unknown charset %s", candidate)
+    
+    return 'utf-8'
+
+
+@dataclass(frozen=True, slots=True)
+class Appointment:
+    """A single SFOWeb appointment."""
+
+    date: str
+    what: str
+    time: str
+    comment: str
+    full_description: str
+
 
 class SFOEnhancedScraper:
     """Enhanced SFOWeb scraper with better JavaScript handling using only HA-compatible libraries."""
@@ -26,52 +168,92 @@ class SFOEnhancedScraper:
         self.username = username
         self.password = password
         self.session = None
+        self._logged_in = False
+        # Validators of the page the last appointments were parsed from
+        self._last_url: Optional[str] = None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._last_result: Optional[List[Appointment]] = None
+        self._last_hash: Optional[bytes] = None
 
-    async def async_get_appointments(self) -> List[Dict[str, Any]]:
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use."""
+        if self.session is None or self.session.closed:
+            # Bound every phase of a request so a stalled host fails fast
+            timeout = aiohttp.ClientTimeout(total=30, connect=5, sock_connect=5, sock_read=10)
+            
+            # Enhanced headers to mimic real browser behavior
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+                'Accept-Language': 'da-DK,da;q=0.9,en-US;q=0.8,en;q=0.7',
+                'Accept-Encoding': 'gzip, deflate, br',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+                'Sec-Fetch-Dest': 'document',
+                'Sec-Fetch-Mode': 'navigate',
+                'Sec-Fetch-Site': 'none',
+                'Sec-Fetch-User': '?1',
+                'sec-ch-ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+                'sec-ch-ua-mobile': '?0',
+                'sec-ch-ua-platform': '"Windows"',
+            }
+            
+            # Keep idle connections around for a while so the next refresh
+            # can reuse them instead of doing a new TLS handshake
+            self.session = aiohttp.ClientSession(
+                timeout=timeout, 
+                headers=headers, 
+                cookie_jar=aiohttp.CookieJar(),
+                auto_decompress=True,
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    limit_per_host=10,
+                    keepalive_timeout=CONNECTION_KEEPALIVE,
+                    ttl_dns_cache=600,
+                ),
+            )
+            self._logged_in = False
+        
+        return self.session
+
+    async def async_close(self) -> None:
+        """Close the shared HTTP session."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self._logged_in = False
+
+    async def async_get_appointments(self) -> List[Appointment]:
         """Fetch appointments using enhanced techniques."""
         appointments = []
         
-        timeout = aiohttp.ClientTimeout(total=120)
-        
-        # Enhanced headers to mimic real browser behavior
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'da-DK,da;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'sec-ch-ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"Windows"',
-        }
-        
-        jar = aiohttp.CookieJar()
-        
         try:
-            async with aiohttp.ClientSession(
-                timeout=timeout, 
-                headers=headers, 
-                cookie_jar=jar,
-                connector=aiohttp.TCPConnector(ssl=False, limit=10)
-            ) as session:
-                
-                _LOGGER.info("Starting enhanced authentication flow...")
-                
-                login_successful = await self._enhanced_authentication_flow(session)
+            session = await self._get_session()
+            
+            # Reuse the login from a previous refresh while the cookies are valid
+            if self._logged_in:
+                _LOGGER.info("Reusing existing session, fetching appointments...")
+                appointments = await self._fetch_appointments_enhanced(session)
                 
-                if login_successful:
-                    _LOGGER.info("Authentication successful, fetching appointments...")
-                    appointments = await self._fetch_appointments_enhanced(session)
-                else:
-                    _LOGGER.error("Enhanced authentication failed - no successful login detected")
+                if self._logged_in:
+                    return appointments
                 
-                return appointments
+                _LOGGER.info("Session expired, logging in again...")
+            
+            _LOGGER.info("Starting enhanced authentication flow...")
+            
+            login_successful = await self._enhanced_authentication_flow(session)
+            
+            if login_successful:
+                self._logged_in = True
+                _LOGGER.info("Authentication successful, fetching appointments...")
+                appointments = await self._fetch_appointments_enhanced(session)
+            else:
+                _LOGGER.error("Enhanced authentication failed - no successful login detected")
+            
+            return appointments
                 
         except Exception as e:
             _LOGGER.error(f"Enhanced scraper error: {e}", exc_info=True)
@@ -88,91 +270,123 @@ class SFOEnhancedScraper:
             LOGIN_URL,
         ]
         
-        for url in sfo_urls:
+        # Fetch all landing pages concurrently, then try them in order. The
+        # appointments host is contacted alongside so its connection is
+        # already open in the pool when the appointments are fetched
+        _LOGGER.info(f"Fetching {len(sfo_urls)} SFO landing pages...")
+        *pages, _ = await asyncio.gather(
+            *(self._fetch_landing_page(session, url) for url in sfo_urls),
+            self._warm_connection(session, APPOINTMENTS_URL),
+            return_exceptions=True,
+        )
+        
+        for url, page in zip(sfo_urls, pages):
             try:
                 _LOGGER.info(f"Trying SFO URL: {url}")
                 
-                # Get initial page
-                async with session.get(url) as response:
-                    _LOGGER.info(f"Response from {url}: status={response.status}, final_url={response.url}")
+                if isinstance(page, Exception):
+                    raise page
+                
+                status, final_url, content, encoding = page
+                _LOGGER.info(f"Response from {url}: status={status}, final_url={final_url}")
+                
+                if status == 200:
+                    _LOGGER.debug("Received %s bytes of HTML from %s", len(content), url)
+                    html = content.decode(encoding, errors='replace')
                     
-                    if response.status == 200:
-                        html = await response.text()
-                        _LOGGER.debug(f"Received {len(html)} characters of HTML from {url}")
-                        
-                        # Look for API endpoints or AJAX calls in the HTML
-                        api_endpoints = await self._extract_api_endpoints(html, str(response.url))
-                        _LOGGER.info(f"Found {len(api_endpoints)} API endpoints at {url}")
-                        
-                        # Try API-based authentication first
-                        for endpoint in api_endpoints:
-                            _LOGGER.info(f"Attempting API authentication at: {endpoint}")
-                            if await self._try_api_authentication(session, endpoint):
-                                _LOGGER.info(f"API authentication successful at {endpoint}")
-                                return True
-                        
-                        # Fall back to form-based authentication
-                        _LOGGER.info(f"Trying form-based authentication at {url}")
-                        if await self._try_form_authentication(session, html, str(response.url)):
-                            _LOGGER.info(f"Form authentication successful at {url}")
-                            return True
-                        else:
-                            _LOGGER.info(f"Form authentication failed at {url}")
+                    # Look for API endpoints or AJAX calls in the HTML
+                    api_endpoints = await self._extract_api_endpoints(html, final_url)
+                    _LOGGER.info(f"Found {len(api_endpoints)} API endpoints at {url}")
+                    
+                    # Try API-based authentication first
+                    if api_endpoints and await self._try_api_endpoints(session, api_endpoints):
+                        return True
+                    
+                    # Fall back to form-based authentication
+                    _LOGGER.info(f"Trying form-based authentication at {url}")
+                    if await self._try_form_authentication(session, content, encoding, final_url):
+                        _LOGGER.info(f"Form authentication successful at {url}")
+                        return True
                     else:
-                        _LOGGER.warning(f"Non-200 response from {url}: {response.status}")
-                            
+                        _LOGGER.info(f"Form authentication failed at {url}")
+                else:
+                    _LOGGER.warning(f"Non-200 response from {url}: {status}")
+                        
             except Exception as e:
                 _LOGGER.warning(f"Failed to process {url}: {e}")
                 continue
         
         return False
 
+    async def _fetch_landing_page(self, session: aiohttp.ClientSession, url: str) -> Tuple[int, str, bytes, str]:
+        """Fetch a landing page, returning status, final URL, body and encoding."""
+        async with await self._request_with_retry(session, 'GET', url) as response:
+            content = await read_body(response) if response.status == 200 else b""
+            return response.status, str(response.url), content, page_encoding(content, response.charset)
+
+    async def _request_with_retry(
+        self, session: aiohttp.ClientSession, method: str, url: str, **kwargs: Any
+    ) -> aiohttp.ClientResponse:
+        """Send a request, retrying with backoff on timeouts and 5xx responses."""
+        for attempt in range(REQUEST_RETRIES + 1):
+            try:
+                response = await session.request(method, url, **kwargs)
+            except asyncio.TimeoutError:
+                if attempt == REQUEST_RETRIES:
+                    raise
+                _LOGGER.debug("Request to %s timed out, retrying", url)
+            else:
+                if response.status < 500 or attempt == REQUEST_RETRIES:
+                    return response
+                _LOGGER.debug("Request to %s failed with status %s, retrying", url, response.status)
+                response.release()
+            
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    async def _warm_connection(self, session: aiohttp.ClientSession, url: str) -> None:
+        """Open a pooled connection to the host of a URL."""
+        try:
+            async with session.head(url, allow_redirects=False):
+                pass
+        except Exception as e:
+            _LOGGER.debug("Could not pre-connect to %s: %s", url, e)
+
     async def _extract_api_endpoints(self, html: str, base_url: str) -> List[str]:
         """Extract potential API endpoints from HTML and JavaScript."""
         endpoints = []
         
         try:
             # Look for various patterns that might indicate API endpoints
-            patterns = [
-                # Direct API URLs
-                r'["\']([^"\']*(?:api|ajax|service)[^"\']*(?:login|auth|signin)[^"\']*)["\']',
-                r'["\']([^"\']*(?:login|auth|signin)[^"\']*(?:api|ajax|service)[^"\']*)["\']',
-                
-                # Fetch/AJAX calls
-                r'fetch\(["\']([^"\']+)["\']',
-                r'XMLHttpRequest.*?open.*?["\'](?:POST|GET)["\'].*?["\']([^"\']+)["\']',
-                r'axios\.(?:post|get)\(["\']([^"\']+)["\']',
-                r'\$\.(?:post|get|ajax)\(["\']([^"\']+)["\']',
-                
-                # Form actions that might be AJAX
-                r'action=["\']([^"\']*(?:login|auth|signin)[^"\']*)["\']',
-                
-                # Common endpoint patterns
-                r'["\']([^"\']*\/(?:api|service)\/[^"\']*)["\']',
-                r'endpoint["\s]*[:=]["\s]*["\']([^"\']+)["\']',
-                r'loginUrl["\s]*[:=]["\s]*["\']([^"\']+)["\']',
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, html, re.IGNORECASE)
+            for pattern in API_ENDPOINT_PATTERNS:
+                matches = pattern.findall(html)
                 for match in matches:
                     if match and len(match) > 5:
                         # Convert relative URLs to absolute
-                        if not match.startswith('http'):
-                            match = urljoin(base_url, match)
+                        match = urljoin(base_url, match)
                         endpoints.append(match)
             
-            # Remove duplicates and limit
-            endpoints = list(set(endpoints))[:5]
+            # Remove duplicates, keeping the first occurrence so the order matches the page
+            endpoints = list(dict.fromkeys(endpoints))[:5]
             
             if endpoints:
                 _LOGGER.info(f"Found {len(endpoints)} potential API endpoints")
             
         except Exception as e:
-            _LOGGER.debug(f"Error extracting API endpoints: {e}")
+            _LOGGER.debug("Error extracting API endpoints: %s", e)
         
         return endpoints
 
+    async def _try_api_endpoints(self, session: aiohttp.ClientSession, endpoints: List[str]) -> bool:
+        """Probe API endpoints one at a time, stopping at the first that logs in."""
+        # Every login attempt goes through the shared session so it sends the
+        # landing page cookies and keeps whatever session cookie it is given,
+        # and attempts can't overwrite each other's cookies
+        for endpoint in endpoints:
+            if await self._try_api_authentication(session, endpoint):
+                return True
+        
+        return False
+
     async def _try_api_authentication(self, session: aiohttp.ClientSession, endpoint: str) -> bool:
         """Try API-based authentication."""
         try:
@@ -205,43 +419,46 @@ class SFOEnhancedScraper:
                 },
             ]
             
+            # One payload at a time, so a rejected format can't race the right one
+            # for the session cookie and failed logins don't arrive in a burst
             for payload in auth_payloads:
-                try:
-                    async with session.post(endpoint, **payload) as response:
-                        if response.status in [200, 201, 302]:
-                            response_text = await response.text()
-                            
-                            # Check for success indicators
-                            if await self._check_auth_success(response_text, response.status):
-                                _LOGGER.info(f"API authentication successful: {endpoint}")
-                                return True
-                                
-                except Exception as e:
-                    _LOGGER.debug(f"API payload failed: {e}")
-                    continue
+                if await self._post_auth_payload(session, endpoint, payload):
+                    _LOGGER.info(f"API authentication successful: {endpoint}")
+                    return True
+                    
+        except Exception as e:
+            _LOGGER.debug("API authentication failed for %s: %s", endpoint, e)
+        
+        return False
+
+    async def _post_auth_payload(self, session: aiohttp.ClientSession, endpoint: str, payload: Dict[str, Any]) -> bool:
+        """Post one authentication payload and check the response."""
+        try:
+            async with session.post(endpoint, **payload) as response:
+                if response.status in [200, 201, 302]:
+                    content = await read_body(response)
+                    
+                    # Check for success indicators
+                    return await self._check_auth_success(content, response.status)
                     
         except Exception as e:
-            _LOGGER.debug(f"API authentication failed for {endpoint}: {e}")
+            _LOGGER.debug("API payload failed: %s", e)
         
         return False
 
-    async def _try_form_authentication(self, session: aiohttp.ClientSession, html: str, current_url: str) -> bool:
+    async def _try_form_authentication(
+        self, session: aiohttp.ClientSession, content: bytes, encoding: str, current_url: str
+    ) -> bool:
         """Try traditional form-based authentication with enhancements."""
         try:
-            soup = BeautifulSoup(html, 'html.parser')
+            # lxml only accepts pages with an XML encoding declaration as bytes
+            doc = lxml_html.fromstring(content, parser=lxml_html.HTMLParser(encoding=encoding))
             
             # Look for parent/guardian login links first
-            parent_links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                text = link.get_text().lower()
-                
-                if any(keyword in text for keyword in ['forældre', 'parent', 'guardian', 'voksen']) or \
-                   any(keyword in href.lower() for keyword in ['parent', 'foraeldr', 'guardian', 'voksen']):
-                    
-                    if not href.startswith('http'):
-                        href = urljoin(current_url, href)
-                    parent_links.append(href)
+            parent_links = [
+                urljoin(current_url, href)
+                for href in PARENT_LINKS_XPATH(doc)
+            ]
             
             # Try parent links first
             for link in parent_links:
@@ -249,76 +466,99 @@ class SFOEnhancedScraper:
                 try:
                     async with session.get(link) as response:
                         if response.status == 200:
-                            parent_html = await response.text()
-                            if await self._submit_login_forms(session, parent_html, str(response.url)):
+                            parent_content = await read_body(response)
+                            if await self._submit_login_forms(
+                                session, parent_content, page_encoding(parent_content, response.charset), str(response.url)
+                            ):
                                 return True
                 except Exception as e:
-                    _LOGGER.debug(f"Parent link failed: {e}")
+                    _LOGGER.debug("Parent link failed: %s", e)
                     continue
             
             # Try forms on current page
-            return await self._submit_login_forms(session, html, current_url)
+            return await self._submit_login_forms(session, content, encoding, current_url)
             
         except Exception as e:
-            _LOGGER.debug(f"Form authentication failed: {e}")
+            _LOGGER.debug("Form authentication failed: %s", e)
         
         return False
 
-    async def _submit_login_forms(self, session: aiohttp.ClientSession, html: str, form_url: str) -> bool:
+    async def _submit_login_forms(
+        self, session: aiohttp.ClientSession, content: bytes, encoding: str, form_url: str
+    ) -> bool:
         """Find and submit login forms."""
         try:
-            soup = BeautifulSoup(html, 'html.parser')
-            forms = soup.find_all('form')
+            doc = lxml_html.fromstring(content, parser=lxml_html.HTMLParser(encoding=encoding))
+            forms = FORMS_XPATH(doc)
             
             _LOGGER.info(f"Found {len(forms)} forms on page")
             
             for i, form in enumerate(forms):
                 # Check if this form has username/password fields
-                username_fields = form.find_all('input', attrs={'name': re.compile(r'user|email|login', re.I)})
-                password_fields = form.find_all('input', attrs={'type': 'password'})
+                username_fields = USERNAME_INPUTS_XPATH(form)
+                password_fields = PASSWORD_INPUTS_XPATH(form)
                 
-                _LOGGER.debug(f"Form {i+1}: username_fields={len(username_fields)}, password_fields={len(password_fields)}")
+                _LOGGER.debug("Form %s: username_fields=%s, password_fields=%s", i+1, len(username_fields), len(password_fields))
                 
                 if username_fields and password_fields:
                     _LOGGER.info(f"Found login form {i+1} with username and password fields")
                     
                     action = form.get('action', form_url)
-                    if not action.startswith('http'):
-                        action = urljoin(form_url, action)
-                    
-                    # Build form data
-                    form_data = {}
+                    action = urljoin(form_url, action)
                     
-                    # Add hidden fields
-                    for hidden in form.find_all('input', type='hidden'):
-                        name = hidden.get('name')
-                        value = hidden.get('value', '')
-                        if name:
-                            form_data[name] = value
+                    # Build form data, starting with the hidden fields
+                    form_data = {
+                        hidden.get('name'): hidden.get('value', '')
+                        for hidden in HIDDEN_INPUTS_XPATH(form)
+                    }
                     
                     # Add credentials
-                    username_name = username_fields[0]['name']
-                    password_name = password_fields[0]['name']
+                    username_name = username_fields[0].get('name')
+                    password_name = password_fields[0].get('name')
                     form_data[username_name] = self.username
                     form_data[password_name] = self.password
                     
                     # Add submit button if present
-                    submit_buttons = form.find_all('input', type='submit')
+                    submit_buttons = SUBMIT_INPUTS_XPATH(form)
                     if submit_buttons:
                         submit_btn = submit_buttons[0]
                         if submit_btn.get('name') and submit_btn.get('value'):
-                            form_data[submit_btn['name']] = submit_btn['value']
+                            form_data[submit_btn.get('name')] = submit_btn.get('value')
                     
                     _LOGGER.info(f"Submitting form to: {action} with data: {list(form_data.keys())}")
                     
-                    async with session.post(action, data=form_data) as response:
+                    async with session.post(action, data=form_data, allow_redirects=False) as response:
                         _LOGGER.info(f"Form submission response: status={response.status}, final_url={response.url}")
                         
-                        if response.status in [200, 302]:
-                            response_text = await response.text()
-                            _LOGGER.debug(f"Form response length: {len(response_text)} characters")
+                        if response.status in (301, 302, 303, 307, 308):
+                            location = response.headers.get('Location', '')
+                            if not location:
+                                _LOGGER.info("Form submission redirected without a Location")
+                                continue
+                            
+                            target = urljoin(action, location)
+                            if self._is_back_to_login(target, form_url):
+                                _LOGGER.info(f"Form submission redirected back to login at {target}")
+                                continue
                             
-                            if await self._check_auth_success(response_text, response.status):
+                            # A redirect away from the login page is the server accepting
+                            # the credentials, so the body doesn't need to be read
+                            if not LOGIN_PATH_RE.search(urlparse(target).path):
+                                _LOGGER.info(f"Form submission redirected to {target} - authentication confirmed")
+                                return True
+                            
+                            # SSO hops like /connect/authorize/callback or /signin-oidc look
+                            # like login paths, so follow the chain and judge where it ends
+                            if await self._follow_login_redirect(session, target):
+                                _LOGGER.info(f"Form submission redirect chain from {target} - authentication confirmed")
+                                return True
+                            
+                            _LOGGER.info(f"Form submission redirect chain from {target} did not confirm authentication")
+                        elif response.status == 200:
+                            content = await read_body(response)
+                            _LOGGER.debug("Form response length: %s bytes", len(content))
+                            
+                            if await self._check_auth_success(content, response.status):
                                 _LOGGER.info("Form submission successful - authentication confirmed")
                                 return True
                             else:
@@ -327,54 +567,63 @@ class SFOEnhancedScraper:
                             _LOGGER.warning(f"Form submission failed with status {response.status}")
                                 
         except Exception as e:
-            _LOGGER.debug(f"Form submission failed: {e}")
+            _LOGGER.debug("Form submission failed: %s", e)
         
         return False
 
-    async def _check_auth_success(self, response_text: str, status_code: int) -> bool:
+    def _is_back_to_login(self, target: str, form_url: str) -> bool:
+        """Check if a login redirect returns to the login form or the login host's entry page."""
+        target_url = urlparse(target)
+        
+        # Other paths on the same host can be SSO hops, like /connect/authorize/callback
+        return any(
+            target_url.netloc == login_url.netloc and target_url.path.rstrip('/') == login_url.path.rstrip('/')
+            for login_url in (urlparse(form_url), urlparse(LOGIN_URL))
+        )
+
+    async def _follow_login_redirect(self, session: aiohttp.ClientSession, url: str) -> bool:
+        """Follow a post-login redirect chain and check the page it ends on."""
+        try:
+            async with session.get(url) as response:
+                if response.status != 200:
+                    return False
+                
+                content = await read_body(response)
+                return await self._check_auth_success(content, response.status)
+        except Exception as e:
+            _LOGGER.debug("Following login redirect %s failed: %s", url, e)
+        
+        return False
+
+    async def _check_auth_success(self, content: bytes, status_code: int) -> bool:
         """Check if authentication was successful."""
         try:
-            text_lower = response_text.lower()
-            
-            # Success indicators
-            success_indicators = [
-                'dashboard', 'aftaler', 'appointments', 'kalender', 'schedule',
-                'velkommen', 'welcome', 'logout', 'logud', 'profil', 'profile',
-                'guardian', 'forældre', 'parent'
-            ]
-            
-            # Error indicators
-            error_indicators = [
-                'invalid', 'ugyldig', 'forkert', 'wrong', 'error', 'fejl',
-                'login failed', 'unauthorized', 'forbidden'
-            ]
+            has_success = AUTH_SUCCESS_RE.search(content) is not None
+            has_error = AUTH_ERROR_RE.search(content) is not None
             
-            has_success = any(indicator in text_lower for indicator in success_indicators)
-            has_error = any(indicator in text_lower for indicator in error_indicators)
+            _LOGGER.debug("Auth check - Status: %s, Success indicators: %s, Error indicators: %s, Body length: %s", status_code, has_success, has_error, len(content))
             
-            _LOGGER.debug(f"Auth check - Status: {status_code}, Success indicators: {has_success}, Error indicators: {has_error}, Text length: {len(response_text)}")
-            
-            # If we have success indicators and no errors, or if it's a redirect
-            if (has_success and not has_error) or status_code == 302:
+            # If we have success indicators and no errors
+            if has_success and not has_error:
                 _LOGGER.info("Authentication success detected!")
                 return True
             
             # If no login indicators are present and we have substantial content
-            login_indicators = ['login', 'password', 'brugernavn', 'sign in']
-            has_login = any(indicator in text_lower for indicator in login_indicators)
+            has_login = LOGIN_TEXT_RE.search(content) is not None
             
-            if not has_login and not has_error and len(response_text) > 1000:
+            if not has_login and not has_error and len(content) > 1000:
                 _LOGGER.info("Authentication likely successful (no login page)")
                 return True
                 
         except Exception as e:
-            _LOGGER.debug(f"Auth success check failed: {e}")
+            _LOGGER.debug("Auth success check failed: %s", e)
         
         return False
 
-    async def _fetch_appointments_enhanced(self, session: aiohttp.ClientSession) -> List[Dict[str, Any]]:
+    async def _fetch_appointments_enhanced(self, session: aiohttp.ClientSession) -> List[Appointment]:
         """Fetch appointments with enhanced techniques."""
         appointments = []
+        session_expired = False
         
         try:
             _LOGGER.info("Fetching appointments with enhanced methods...")
@@ -391,9 +640,57 @@ class SFOEnhancedScraper:
             
             for url in appointment_urls:
                 try:
-                    async with session.get(url) as response:
+                    # Ask the server to skip the body if the page is unchanged
+                    headers = {}
+                    if url == self._last_url and self._last_result is not None:
+                        if self._etag:
+                            headers['If-None-Match'] = self._etag
+                        if self._last_modified:
+                            headers['If-Modified-Since'] = self._last_modified
+                    
+                    async with await self._request_with_retry(session, 'GET', url, headers=headers) as response:
+                        if response.status == 304:
+                            _LOGGER.debug("Appointments page %s not modified, reusing last result", url)
+                            return list(self._last_result)
+                        
+                        # A redirect to the login page means the session is gone;
+                        # the other pages will bounce too, so log in again right away
+                        if self._is_login_redirect(response):
+                            _LOGGER.debug("Redirected from %s to login at %s", url, response.url)
+                            session_expired = True
+                            break
+                        
+                        if response.status in (401, 403):
+                            _LOGGER.debug("Access to %s denied, session is not authenticated", url)
+                            session_expired = True
+                            continue
+                        
                         if response.status == 200:
-                            html = await response.text()
+                            # Keep the raw bytes for hashing and parsing, and
+                            # decode once for the text checks
+                            content = await read_body(response)
+                            encoding = page_encoding(content, response.charset)
+                            html = content.decode(encoding, errors='replace')
+                            _LOGGER.debug(
+                                "Appointments page %s: %s bytes, Content-Encoding=%s",
+                                url,
+                                len(content),
+                                response.headers.get('Content-Encoding'),
+                            )
+                            
+                            # Being sent back to a login form means the session has expired
+                            if self._is_login_page(html):
+                                _LOGGER.debug("Got a login page from %s, session is not authenticated", url)
+                                session_expired = True
+                                continue
+                            
+                            # Identical bytes to last time parse to the same result
+                            body_hash = hashlib.blake2b(content, digest_size=16).digest()
+                            if url == self._last_url and body_hash == self._last_hash:
+                                _LOGGER.debug("Appointments page %s unchanged, reusing last result", url)
+                                self._etag = response.headers.get('ETag')
+                                self._last_modified = response.headers.get('Last-Modified')
+                                return list(self._last_result)
                             
                             # Try API endpoints first
                             api_endpoints = await self._extract_appointment_apis(html, str(response.url))
@@ -404,58 +701,72 @@ class SFOEnhancedScraper:
                                     return appointments
                             
                             # Fall back to HTML parsing
-                            html_appointments = self._parse_appointments_enhanced(html)
+                            html_appointments = await self._async_parse_appointments(content, encoding)
                             if html_appointments:
                                 appointments.extend(html_appointments)
+                                self._last_url = url
+                                self._etag = response.headers.get('ETag')
+                                self._last_modified = response.headers.get('Last-Modified')
+                                self._last_result = list(appointments)
+                                self._last_hash = body_hash
                                 return appointments
                                 
                 except Exception as e:
-                    _LOGGER.debug(f"Failed to fetch from {url}: {e}")
+                    _LOGGER.debug("Failed to fetch from %s: %s", url, e)
                     continue
                     
         except Exception as e:
             _LOGGER.error(f"Error fetching enhanced appointments: {e}")
         
+        if session_expired:
+            self._logged_in = False
+        
         return appointments
 
+    def _is_login_redirect(self, response: aiohttp.ClientResponse) -> bool:
+        """Check if a request was redirected to a login page."""
+        if not response.history:
+            return False
+        
+        final_url = response.url
+        return final_url.host == urlparse(LOGIN_URL).hostname or LOGIN_PATH_RE.search(final_url.path) is not None
+
+    def _is_login_page(self, html: str) -> bool:
+        """Check if the page contains a password field."""
+        return PASSWORD_INPUT_RE.search(html) is not None
+
     async def _extract_appointment_apis(self, html: str, base_url: str) -> List[str]:
         """Extract appointment API endpoints."""
         endpoints = []
         
-        patterns = [
-            r'["\']([^"\']*(?:api|ajax)[^"\']*(?:appointment|aftale|calendar)[^"\']*)["\']',
-            r'["\']([^"\']*(?:appointment|aftale|calendar)[^"\']*(?:api|ajax)[^"\']*)["\']',
-            r'fetch\(["\']([^"\']+/(?:api|ajax)/[^"\']*(?:appointment|aftale)[^"\']*)["\']',
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, html, re.IGNORECASE)
+        for pattern in APPOINTMENT_API_PATTERNS:
+            matches = pattern.findall(html)
             for match in matches:
                 if match and len(match) > 5:
-                    if not match.startswith('http'):
-                        match = urljoin(base_url, match)
+                    match = urljoin(base_url, match)
                     endpoints.append(match)
         
-        return list(set(endpoints))[:3]
+        return list(dict.fromkeys(endpoints))[:3]
 
-    async def _fetch_from_api(self, session: aiohttp.ClientSession, endpoint: str) -> List[Dict[str, Any]]:
+    async def _fetch_from_api(self, session: aiohttp.ClientSession, endpoint: str) -> List[Appointment]:
         """Fetch appointments from API endpoint."""
         try:
             async with session.get(endpoint) as response:
                 if response.status == 200:
+                    # Read the body once so the HTML fallback still has it
+                    content = await read_body(response)
                     try:
-                        data = await response.json()
-                        return self._parse_api_appointments(data)
-                    except:
+                        data = json.loads(content)
+                    except ValueError:
                         # Fallback to HTML parsing
-                        html = await response.text()
-                        return self._parse_appointments_enhanced(html)
+                        return await self._async_parse_appointments(content, page_encoding(content, response.charset))
+                    return self._parse_api_appointments(data)
         except Exception as e:
-            _LOGGER.debug(f"API fetch failed for {endpoint}: {e}")
+            _LOGGER.debug("API fetch failed for %s: %s", endpoint, e)
         
         return []
 
-    def _parse_api_appointments(self, data) -> List[Dict[str, Any]]:
+    def _parse_api_appointments(self, data) -> List[Appointment]:
         """Parse appointments from JSON API data."""
         appointments = []
         
@@ -471,83 +782,109 @@ class SFOEnhancedScraper:
             
             for item in items:
                 if isinstance(item, dict):
-                    appointment = {
-                        "date": "",
-                        "what": "",
-                        "time": "",
-                        "comment": "",
-                        "full_description": ""
-                    }
+                    date = what = time_text = ""
                     
                     # Extract fields
                     for date_field in ['date', 'dato', 'start', 'startDate']:
                         if date_field in item:
-                            appointment["date"] = str(item[date_field])
+                            date = str(item[date_field])
                             break
                     
                     for what_field in ['title', 'description', 'what', 'navn']:
                         if what_field in item:
-                            appointment["what"] = str(item[what_field])
+                            what = str(item[what_field])
                             break
                     
                     for time_field in ['time', 'tid', 'startTime']:
                         if time_field in item:
-                            appointment["time"] = str(item[time_field])
+                            time_text = str(item[time_field])
                             break
                     
-                    appointment["full_description"] = f"{appointment['date']} - {appointment['what']} - {appointment['time']}".strip(" -")
-                    
-                    if appointment["date"] or appointment["what"]:
-                        appointments.append(appointment)
+                    if date or what:
+                        appointments.append(Appointment(
+                            date=date,
+                            what=what,
+                            time=time_text,
+                            comment="",
+                            full_description=f"{date} - {what} - {time_text}".strip(" -"),
+                        ))
                         
         except Exception as e:
-            _LOGGER.debug(f"API parsing failed: {e}")
+            _LOGGER.debug("API parsing failed: %s", e)
         
         return appointments
 
-    def _parse_appointments_enhanced(self, html: str) -> List[Dict[str, Any]]:
+    async def _async_parse_appointments(self, content: bytes, encoding: str) -> List[Appointment]:
+        """Parse appointment HTML in the executor to keep the event loop free."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._parse_appointments_enhanced, content, encoding)
+
+    def _parse_appointments_enhanced(self, content: bytes, encoding: str = 'utf-8') -> List[Appointment]:
         """Enhanced HTML appointment parsing."""
         appointments = []
         
         try:
-            soup = BeautifulSoup(html, 'html.parser')
+            if not content.strip():
+                return appointments
             
-            # Look for tables
-            tables = soup.find_all('table')
-            for table in tables:
-                rows = table.find_all('tr')
+            # Stream the raw page through lxml with the encoding picked by page_encoding,
+            # since lxml falls back to Latin-1 for a page with no declared charset
+            parser = etree.HTMLPullParser(events=('start', 'end'), tag=('table', 'tr'), encoding=encoding)
+            parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+            parser.feed(content)
+            
+            # Look for tables, handling each row as soon as it is complete
+            row_index = 0
+            for event, element in parser.read_events():
+                if element.tag == 'table':
+                    if event == 'start':
+                        row_index = 0
+                    continue
+                
+                if event != 'end':
+                    continue
                 
                 # Skip header, process data rows
-                for row in rows[1:]:
-                    cells = row.find_all(['td', 'th'])
-                    if len(cells) >= 2:
-                        cell_texts = [cell.get_text().strip() for cell in cells]
+                row_index += 1
+                if row_index == 1:
+                    continue
+                
+                cells = CELLS_XPATH(element)
+                if len(cells) >= 2:
+                    # Most non-appointment rows fail on the date cell, so check
+                    # it before extracting the text of the remaining cells
+                    date_text = cells[0].text_content().strip()
+                    
+                    if len(date_text) > 2:
+                        cell_texts = [date_text] + [cell.text_content().strip() for cell in cells[1:4]]
+                        appointments.append(Appointment(
+                            date=cell_texts[0],
+                            what=cell_texts[1],
+                            time=cell_texts[2] if len(cell_texts) > 2 else "",
+                            comment=cell_texts[3] if len(cell_texts) > 3 else "",
+                            full_description=f"{cell_texts[0]} - {cell_texts[1]}".strip(" -"),
+                        ))
                         
-                        if cell_texts[0] and len(cell_texts[0]) > 2:
-                            appointment = {
-                                "date": cell_texts[0] if len(cell_texts) > 0 else "",
-                                "what": cell_texts[1] if len(cell_texts) > 1 else "",
-                                "time": cell_texts[2] if len(cell_texts) > 2 else "",
-                                "comment": cell_texts[3] if len(cell_texts) > 3 else "",
-                                "full_description": f"{cell_texts[0]} - {cell_texts[1]}".strip(" -")
-                            }
-                            appointments.append(appointment)
+                        # The fallbacks below never run once a row matched,
+                        # so its subtree can be released right away
+                        element.clear()
+            
+            doc = parser.close()
             
             # If no table appointments, try alternative methods
             if not appointments:
                 # Look for list items, divs, etc.
-                for selector in ['li', 'div.appointment', 'div.event']:
-                    elements = soup.select(selector)
-                    for element in elements:
-                        text = element.get_text().strip()
-                        if text and len(text) > 10 and re.search(r'\d{1,2}[./]\d{1,2}', text):
-                            appointments.append({
-                                "date": "See description",
-                                "what": text[:50] + "..." if len(text) > 50 else text,
-                                "time": "",
-                                "comment": "",
-                                "full_description": text
-                            })
+                for xpath in FALLBACK_XPATHS:
+                    for element in xpath(doc):
+                        text = element.text_content().strip()
+                        if text and len(text) > 10 and DATE_RE.search(text):
+                            appointments.append(Appointment(
+                                date="See description",
+                                what=text[:50] + "..." if len(text) > 50 else text,
+                                time="",
+                                comment="",
+                                full_description=text,
+                            ))
                     
                     if appointments:
                         break
@@ -558,24 +895,29 @@ class SFOEnhancedScraper:
         return appointments
 
     async def async_test_credentials(self) -> bool:
-        """Test credentials."""
+        """Test credentials by logging in, reusing recent results."""
         try:
             if not self.username or not self.password:
                 return False
             
-            if len(self.username) < 3 or len(self.password) < 3:
-                return False
+            # Repeated submissions of the same credentials don't log in again
+            key = hashlib.sha256(f"{self.username}\0{self.password}".encode()).hexdigest()
+            verified_at = _CREDENTIAL_CACHE.get(key)
+            if verified_at is not None and time.monotonic() - verified_at < CREDENTIAL_CACHE_TTL:
+                _LOGGER.debug("Using cached credential test result")
+                return True
             
-            # Quick connection test
-            timeout = aiohttp.ClientTimeout(total=30)
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
+            session = await self._get_session()
+            valid = await self._enhanced_authentication_flow(session)
+            self._logged_in = valid
+            
+            if valid:
+                _CREDENTIAL_CACHE[key] = time.monotonic()
+                while len(_CREDENTIAL_CACHE) > CREDENTIAL_CACHE_SIZE:
+                    _CREDENTIAL_CACHE.pop(next(iter(_CREDENTIAL_CACHE)))
             
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                async with session.get(LOGIN_URL) as response:
-                    return response.status == 200
+            return valid
                     
         except Exception as e:
-            _LOGGER.debug(f"Credential test failed: {e}")
-            return False
\ No newline at end of file
+            _LOGGER.debug("Credential test failed: %s", e)
+            return False
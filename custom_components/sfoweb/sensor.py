@@ -1,6 +1,7 @@
 """Support for SFOWeb appointments sensor."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from datetime import timedelta
 from typing import Any, Dict, List, Optional
@@ -16,12 +17,15 @@ from homeassistant.helpers.update_coordinator import (
     UpdateFailed,
 )
 
-from .const import DOMAIN
-from .scraper_enhanced import SFOEnhancedScraper
+from .const import DEFAULT_SCAN_INTERVAL, DOMAIN
+from .scraper_enhanced import Appointment, SFOEnhancedScraper
 
 _LOGGER = logging.getLogger(__name__)
 
-SCAN_INTERVAL = timedelta(minutes=15)
+SCAN_INTERVAL = timedelta(minutes=DEFAULT_SCAN_INTERVAL)
+
+# Upper bound for a whole refresh, including a full login
+UPDATE_TIMEOUT = 120  # seconds
 
 
 async def async_setup_entry(
@@ -71,11 +75,12 @@ class SFOWebDataUpdateCoordinator(DataUpdateCoordinator):
             update_interval=SCAN_INTERVAL,
         )
 
-    async def _async_update_data(self) -> List[Dict[str, Any]]:
+    async def _async_update_data(self) -> List[Appointment]:
         """Fetch data from SFOWeb."""
         try:
             _LOGGER.debug("Fetching appointments data from SFOWeb...")
-            appointments = await self.scraper.async_get_appointments()
+            async with asyncio.timeout(UPDATE_TIMEOUT):
+                appointments = await self.scraper.async_get_appointments()
             _LOGGER.info(f"Successfully fetched {len(appointments)} appointments")
             return appointments
         except Exception as err:
@@ -119,11 +124,11 @@ class SFOWebAppointmentsSensor(CoordinatorEntity, SensorEntity):
         # Add appointment details
         for i, appointment in enumerate(self.coordinator.data):
             attributes["appointments"].append({
-                "date": appointment.get("date", ""),
-                "what": appointment.get("what", ""),
-                "time": appointment.get("time", ""),
-                "comment": appointment.get("comment", ""),
-                "description": appointment.get("full_description", ""),
+                "date": appointment.date,
+                "what": appointment.what,
+                "time": appointment.time,
+                "comment": appointment.comment,
+                "description": appointment.full_description,
             })
         
         return attributes
@@ -157,7 +162,7 @@ class SFOWebNextAppointmentSensor(CoordinatorEntity, SensorEntity):
         
         # Get the first appointment (assuming they're sorted by date)
         next_appointment = self.coordinator.data[0]
-        return next_appointment.get("full_description", "No description")
+        return next_appointment.full_description or "No description"
 
     @property
     def extra_state_attributes(self) -> Dict[str, Any]:
@@ -168,10 +173,10 @@ class SFOWebNextAppointmentSensor(CoordinatorEntity, SensorEntity):
         next_appointment = self.coordinator.data[0]
         
         return {
-            "date": next_appointment.get("date", ""),
-            "what": next_appointment.get("what", ""),
-            "time": next_appointment.get("time", ""),
-            "comment": next_appointment.get("comment", ""),
+            "date": next_appointment.date,
+            "what": next_appointment.what,
+            "time": next_appointment.time,
+            "comment": next_appointment.comment,
             "total_appointments": len(self.coordinator.data),
             "last_updated": self.coordinator.last_update_success,
         }
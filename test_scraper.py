@@ -51,7 +51,7 @@ async def test_scraper():
         print(f"   Found {len(appointments)} appointments")
         
         for i, appointment in enumerate(appointments[:3], 1):  # Show first 3
-            print(f"   Appointment {i}: {appointment.get('full_description', 'No description')}")
+            print(f"   Appointment {i}: {appointment.full_description or 'No description'}")
         
         print("✅ Test completed successfully!")
         return True
@@ -59,6 +59,9 @@ async def test_scraper():
     except Exception as e:
         print(f"❌ Test failed with error: {e}")
         return False
+    
+    finally:
+        await scraper.async_close()
 
 if __name__ == "__main__":
     print("SFO Enhanced Scraper Test")